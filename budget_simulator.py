@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Симулятор перераспределения рекламного бюджета по источникам (раздел 5 ноутбука).
+# Функции вынесены в модуль, чтобы пул процессов мог импортировать их в дочерних процессах
+# при любом способе запуска процессов (fork или spawn).
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+#аппроксимируем кривую привлечения в логарифмах: log(users) = log_users + b * (log(cost) - log_cost_mean)
+#центрирование по среднему логарифму затрат делает параметры почти независимыми
+#sigma2 - дисперсия остатков регрессии, cost_min и cost_max - наблюдавшийся диапазон дневных затрат
+def fit_curves(daily):
+    curves = {}
+    for source, data in daily.groupby('source'):
+        log_cost = np.log(data['cost'].to_numpy())
+        log_users = np.log(data['users'].to_numpy())
+        log_cost_mean = log_cost.mean()
+        coef, cov = np.polyfit(log_cost - log_cost_mean, log_users, 1, cov=True)
+        residuals = log_users - np.polyval(coef, log_cost - log_cost_mean)
+        curves[source] = {'b': coef[0],
+                          'log_users': coef[1],
+                          'cov': cov,
+                          'sigma2': (residuals ** 2).sum() / (len(residuals) - 2),
+                          'log_cost_mean': log_cost_mean,
+                          'cost_min': data['cost'].min(),
+                          'cost_max': data['cost'].max()}
+    return curves
+
+
+#разыграем параметры кривых и конверсий для каждого сценария Монте-Карло
+#b должен лежать в интервале [b_min, 1]: затраты не могут уменьшать приток игроков, а отдача не может расти;
+#розыгрыши вне интервала отбрасываем и разыгрываем заново, их долю по каждому источнику возвращаем в rejected_share
+#к уровню кривой добавляем остаточный шум регрессии, общий на всю кампанию, - это консервативная оценка разброса
+def draw_parameters(curves, source_rates, n_draws=2000, b_min=0.05, seed=42, max_rounds=100):
+    rng = np.random.default_rng(seed)
+    sources = source_rates.index.to_list()
+    b = np.empty((n_draws, len(sources)))
+    log_users = np.empty((n_draws, len(sources)))
+    rejected_share = {}
+    for k, source in enumerate(sources):
+        curve = curves[source]
+        accepted = []
+        n_accepted, n_total = 0, 0
+        for _ in range(max_rounds):
+            draws = rng.multivariate_normal([curve['b'], curve['log_users']], curve['cov'], size=n_draws)
+            draws = draws[(draws[:, 0] >= b_min) & (draws[:, 0] <= 1)]
+            accepted.append(draws)
+            n_accepted += len(draws)
+            n_total += n_draws
+            if n_accepted >= n_draws:
+                break
+        else:
+            raise ValueError('Не удалось разыграть b в интервале [{}, 1] для источника {}'.format(b_min, source))
+        draws = np.vstack(accepted)[:n_draws]
+        b[:, k] = draws[:, 0]
+        log_users[:, k] = draws[:, 1] + rng.normal(0, np.sqrt(curve['sigma2']), size=n_draws)
+        rejected_share[source] = 1 - n_accepted / n_total
+    users = source_rates['users'].to_numpy()
+    finished = source_rates['finished'].to_numpy()
+    science = source_rates['science'].to_numpy()
+    return {'sources': sources,
+            'b': b,
+            'log_users': log_users,
+            'log_cost_mean': np.array([curves[source]['log_cost_mean'] for source in sources]),
+            'cost_min': np.array([curves[source]['cost_min'] for source in sources]),
+            'cost_max': np.array([curves[source]['cost_max'] for source in sources]),
+            'rejected_share': pd.Series(rejected_share),
+            'finish_rate': rng.beta(finished + 1, users - finished + 1, size=(n_draws, len(sources))),
+            'science_share': rng.beta(science + 1, finished - science + 1, size=(n_draws, len(sources)))}
+
+
+#отметим варианты, у которых средние дневные затраты каждого источника лежат в наблюдавшемся диапазоне:
+#за его пределами кривые привлечения ничем не подтверждены
+def within_observed(shares, budgets, params, n_days):
+    daily_cost = shares * budgets[:, None] / n_days
+    return ((daily_cost >= params['cost_min']) & (daily_cost <= params['cost_max'])).all(axis=1)
+
+
+#оценим пачку вариантов сразу по всем сценариям: массивы размера (варианты, сценарии, источники)
+#бюджет считаем затратами за всю кампанию, равномерно распределёнными по n_days дням
+def simulate_chunk(shares, budgets, params, n_days):
+    daily_cost = (shares * budgets[:, None] / n_days)[:, None, :]
+    log_cost = np.log(np.where(daily_cost > 0, daily_cost, 1)) - params['log_cost_mean']
+    users = np.where(daily_cost > 0, n_days * np.exp(params['log_users'] + params['b'] * log_cost), 0)
+    finishers = users * params['finish_rate']
+    science = finishers * params['science_share']
+    total_users = users.sum(axis=2)
+    total_finishers = finishers.sum(axis=2)
+    return np.column_stack([total_users.mean(axis=1),
+                            np.quantile(total_users, 0.05, axis=1),
+                            total_finishers.mean(axis=1),
+                            np.quantile(total_finishers, 0.05, axis=1),
+                            science.sum(axis=2).mean(axis=1)])
+
+
+#параметры передаются в каждый процесс пула один раз через initializer, а не с каждой пачкой
+_worker_params = None
+
+
+def _init_worker(params):
+    global _worker_params
+    _worker_params = params
+
+
+def _simulate_worker(shares, budgets, n_days):
+    return simulate_chunk(shares, budgets, _worker_params, n_days)
+
+
+#разобьём варианты на пачки, чтобы массивы помещались в память, и при n_jobs > 1 посчитаем их в пуле процессов
+def simulate_allocations(shares, budgets, params, n_days, chunk_size=250, n_jobs=1):
+    chunks = [slice(i, i + chunk_size) for i in range(0, len(shares), chunk_size)]
+    if n_jobs is not None and n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(params,)) as pool:
+            results = list(pool.map(_simulate_worker,
+                                    [shares[chunk] for chunk in chunks],
+                                    [budgets[chunk] for chunk in chunks],
+                                    [n_days] * len(chunks)))
+    else:
+        results = [simulate_chunk(shares[chunk], budgets[chunk], params, n_days) for chunk in chunks]
+    scenarios = pd.DataFrame(shares, columns=params['sources'])
+    scenarios['budget'] = budgets
+    scenarios[['users', 'users_p5', 'finishers', 'finishers_p5', 'science_finishers']] = np.vstack(results)
+    return scenarios
+
+
+#эффективная граница: варианты, для которых ни один более дешёвый вариант не даёт больше ожидаемого результата
+def efficient_frontier(scenarios, target='users'):
+    frontier = scenarios.sort_values(['budget', target], ascending=[True, False])
+    best_before = frontier[target].cummax().shift(fill_value=-np.inf)
+    return frontier[frontier[target] > best_before].reset_index(drop=True)
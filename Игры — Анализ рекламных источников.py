@@ -78,6 +78,12 @@
 #     альтернативная - количество действий зависит от источника
 # 
 # **4. Выводы и рекомендации:**
+# 
+# **5. Симуляция перераспределения рекламного бюджета:**
+# 
+#    5.1 Аппроксимировать зависимость привлечения игроков от затрат по каждому источнику
+#    
+#    5.2 Методом Монте-Карло оценить тысячи вариантов распределения бюджета и построить эффективную границу
 
 # # 1. Импортировать библиотеки, изучить общую информацию и сделать предобработку данных
 
@@ -92,6 +98,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 import seaborn as sns
 from scipy import stats as st
+from budget_simulator import (fit_curves, draw_parameters, within_observed,
+                              simulate_allocations, efficient_frontier)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -645,6 +653,138 @@ test(instagram_events, youtube_events, instagram_id, youtube_id)
 # * Больше прибыли принесут пользователи, предпочитающие стратегию исследования, а не сражения с врагом. Стратегию победы над врагом игроки выбирают в два раза чаще чем стратегию исследования. Возможно, стоит сбалансировать игровые стратегии по времени игры, что-то изменить, чтобы сделать строительство более привлекательным для игроков.
 # * Из исследования можно выделить два более перспективных канала привлечения: yandex и youtube. Рекомендую обратить на них больше внимания и уделить на них больше рекламного бюджета.
 
+# # 5. Симуляция перераспределения рекламного бюджета
+
+# Рекомендация увеличить бюджет yandex_direct и youtube опирается на средние значения cac. Чтобы проверить её и дать возможность быстро перебирать варианты, построим симулятор (функции вынесены в модуль *budget_simulator.py* рядом с ноутбуком):
+# * по дневным затратам и числу привлечённых игроков аппроксимируем для каждого источника кривую привлечения `users = a * cost^b` (b < 1 — убывающая отдача)
+# * долю игроков, завершивших уровень, и долю научной победы среди них оценим бета-распределением по данным пользователей
+# * сгенерируем тысячи вариантов распределения бюджета и для каждого разыграем тысячи сценариев Монте-Карло одним массивом NumPy, без пересчёта в pandas
+# * оставим только варианты, в которых дневные затраты каждого источника не выходят за наблюдавшийся диапазон: кривые построены всего по 7 точкам, и за его пределами они ничем не подтверждены
+
+# **5.1 Аппроксимировать зависимость привлечения игроков от затрат по каждому источнику**
+
+# In[54]:
+
+
+#соберём в одну таблицу дневные затраты и число привлечённых игроков по каждому источнику
+daily = (ad_dynamics.stack().rename('cost').to_frame()
+         .join(user_dynamic.stack().rename('users'), how='inner')
+         .dropna()
+         .reset_index())
+daily.head()
+
+
+# In[55]:
+
+
+curves = fit_curves(daily)
+
+
+# In[56]:
+
+
+#посчитаем по каждому источнику, сколько игроков завершили уровень и сколько из них научной победой
+finished_id = game_actions.query('event == "finished_stage_1"')['user_id']
+user_features = user_source.assign(finished=user_source['user_id'].isin(finished_id))
+user_features['science'] = user_features['finished'] & user_features['user_id'].isin(science_id)
+source_rates = user_features.groupby('source').agg(users=('user_id', 'count'),
+                                                   finished=('finished', 'sum'),
+                                                   science=('science', 'sum'))
+source_rates
+
+
+# **5.2 Методом Монте-Карло оценить варианты распределения бюджета и построить эффективную границу**
+
+# In[57]:
+
+
+#разыграем параметры кривых и конверсий; rejected_share - доля розыгрышей b вне интервала [0.05, 1], которые пришлось отбросить
+params = draw_parameters(curves, source_rates, n_draws=2000)
+curves_table = pd.DataFrame(curves).T[['b', 'sigma2', 'cost_min', 'cost_max']].astype(float)
+curves_table['rejected_share'] = params['rejected_share']
+curves_table
+
+
+# Большая доля отброшенных розыгрышей значит, что по 7 точкам нельзя исключить b ≥ 1, то есть убывающая отдача для источника данными не подтверждена. Ограничение b ≤ 1 — допущение модели, а не вывод из данных.
+
+# In[58]:
+
+
+#текущее распределение бюджета и кандидаты вокруг него: доли разыгрываем из распределения Дирихле с центром в текущих долях,
+#общий бюджет - от 50% до 150% текущего; варианты вне наблюдавшегося диапазона дневных затрат отбрасываем
+n_days = len(daily['sale_date'].unique())
+current_costs = daily.groupby('source')['cost'].sum()[source_rates.index]
+current_budget = current_costs.sum()
+
+rng = np.random.default_rng(42)
+n_splits = 10000
+shares = np.vstack([current_costs.to_numpy() / current_budget,
+                    rng.dirichlet(20 * current_costs.to_numpy() / current_budget, size=n_splits)])
+budgets = np.concatenate([[current_budget],
+                          rng.uniform(0.5 * current_budget, 1.5 * current_budget, size=n_splits)])
+
+in_range = within_observed(shares, budgets, params, n_days)
+print('Вариантов в наблюдавшемся диапазоне затрат: {} из {}'.format(in_range.sum(), len(in_range)))
+shares, budgets = shares[in_range], budgets[in_range]
+
+
+# In[59]:
+
+
+get_ipython().run_cell_magic('time', '', 'scenarios = simulate_allocations(shares, budgets, params, n_days)\n')
+
+
+# In[60]:
+
+
+current = scenarios.iloc[0]
+users_frontier = efficient_frontier(scenarios, 'users')
+finishers_frontier = efficient_frontier(scenarios, 'finishers')
+print('Текущее распределение: {:.0f} игроков, {:.0f} завершивших уровень'.format(current['users'], current['finishers']))
+finishers_frontier.tail()
+
+
+# In[61]:
+
+
+fig = go.Figure()
+fig.add_trace(go.Scatter(x=scenarios['budget'], y=scenarios['finishers'], mode='markers',
+                         name='варианты', marker=dict(size=3, opacity=0.3)))
+fig.add_trace(go.Scatter(x=finishers_frontier['budget'], y=finishers_frontier['finishers'], mode='lines',
+                         name='эффективная граница'))
+fig.add_trace(go.Scatter(x=[current['budget']], y=[current['finishers']], mode='markers',
+                         name='текущее распределение', marker=dict(size=12, symbol='x')))
+fig.update_layout(title='Ожидаемое количество игроков, завершивших уровень, в зависимости от бюджета',
+                  xaxis_title='бюджет',
+                  yaxis_title='игроков, завершивших уровень')
+fig.show()
+
+
+# In[62]:
+
+
+#лучшее распределение, которое не дороже текущего
+best = finishers_frontier[finishers_frontier['budget'] <= current_budget].iloc[-1]
+pd.DataFrame({'текущее': current, 'лучшее': best}).round(2)
+
+
+# In[63]:
+
+
+#сравним доли yandex_direct и youtube в лучшем и текущем распределении
+for source in ['yandex_direct', 'youtube_channel_reklama']:
+    print('{}: доля {:.0%} -> {:.0%}'.format(source, current[source], best[source]))
+print('Завершивших уровень: {:+.0f} в среднем, {:+.0f} в пессимистичном сценарии'.format(
+    best['finishers'] - current['finishers'], best['finishers_p5'] - current['finishers_p5']))
+
+
+# **Вывод:**
+# * Рекомендация из раздела 4 подтверждается в пределах наблюдавшихся затрат: на эффективной границе доли yandex_direct и youtube выше текущих, а бюджет уходит от facebook_ads и instagram_new_adverts — самых дорогих по cac источников. При бюджете не больше текущего такое распределение даёт больше игроков, завершивших уровень, и в среднем, и в пессимистичном сценарии (`finishers_p5`); конкретные доли и прирост — в выводе ячейки выше
+# * Сдвиг надо делать постепенно: кривые привлечения построены по 7 дням, за которые затраты упали примерно в 25 раз, и для части источников данные не исключают b ≥ 1 (см. `rejected_share`). Поэтому модель не может оценить доли, сильно отличающиеся от текущих, и варианты с дневными затратами вне наблюдавшегося диапазона (например, youtube дороже 454 в день) из симуляции исключены
+# * Варианты можно перебирать интерактивно: достаточно поменять `shares` и `budgets` и перезапустить `simulate_allocations`, при большом числе вариантов и нескольких ядрах — с `n_jobs > 1`
+
+
+
 # In[ ]:
 
 